@@ -1,3 +1,7 @@
+import argparse
+
+import psutil
+import numpy as np
 from neo4j import GraphDatabase
 
 
@@ -9,42 +13,64 @@ class neo4j_driver:
     def close(self):
         self.driver.close()
 
-    def query(self, q):
+    def query(self, q, params=None):
         with self.driver.session() as session:
-            res = session.run(q)
+            res = session.run(q, params)
             return res
 
     def clear(self):
         self.query("MATCH (n) DETACH DELETE n")
 
 
+q_create_index = "CREATE INDEX user_name IF NOT EXISTS FOR (n:User) ON (n.name)"
+q_merge_edges = "UNWIND $rows AS r MERGE (a:User {name: r[0]}) MERGE (b:User {name: r[1]}) CREATE (a)-[:know]->(b)"
+# WikiTalk.txt has to be in the import directory of the Neo4j server
+q_load_csv = """CALL apoc.periodic.iterate(
+    "LOAD CSV FROM 'file:///WikiTalk.txt' AS row FIELDTERMINATOR '\\t'
+     WITH row WHERE NOT row[0] STARTS WITH '#' RETURN row",
+    "MERGE (a:User {name: row[0]}) MERGE (b:User {name: row[1]}) CREATE (a)-[:know]->(b)",
+    {batchSize: 10000, parallel: false})"""
+
+
+def load_client_side(path, batch_size=10000):
+    # parse the file here and send the edges in batches, for servers that cannot read the file themselves
+    # the ids are parsed as int64, a str array would pad every id to the longest one; only the batch sent is converted
+    edges = np.loadtxt(path, dtype=np.int64, comments="#", delimiter="\t", ndmin=2)
+    for i in range(0, len(edges), batch_size):
+        n.query(q_merge_edges, {"rows": edges[i:i + batch_size].astype(str).tolist()})
+        print(f"{min(i + batch_size, len(edges))} edges sent")
+
+
+def load_server_side():
+    # the server reads the file and commits every batchSize rows, nothing goes over Bolt per edge
+    n.query(q_load_csv)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--client-side", action="store_true",
+                    help="parse data_sets/WikiTalk.txt here instead of letting the server load it")
+args = parser.parse_args()
+
 n = neo4j_driver("bolt://localhost:7687", "neo4j", "1234")
 n.clear()
+n.query(q_create_index)
+if args.client_side:
+    load_client_side("data_sets/WikiTalk.txt")
+else:
+    load_server_side()
 
-q_merge_node = "MERGE (n {{name: \"{0}\"}})"
-q_create_rel = "MATCH (a), (b) WHERE a.name = \"{0}\" AND b.name = \"{1}\" CREATE (a)-[:know]->(b)"
 
-with open("data_sets/WikiTalk.txt") as file:
-    for line in file:
-        if line[0] == "#":
-            continue
-        a, b = line.split()
-        print(a, b)
-        n.query(q_merge_node.format(a))
-        n.query(q_merge_node.format(b))
-        n.query(q_create_rel.format(a, b))
+process = psutil.Process()
 
 
 def measure_ram():
     # measure ram usage
     l = [i for i in range(10000000)]
-    process = psutil.Process(os.getpid())
     return process.memory_info().rss
 
 
 def measure_cpu():
     # measure cpu usage of this process
-    process = psutil.Process(os.getpid())
     return process.cpu_percent(interval=1)
 
 
@@ -1,12 +1,30 @@
+"""
+Benchmarks for the graph databases in databases.py.
+
+While a benchmark runs, a Profiler samples the CPU and memory usage of the database processes on average every
+interval seconds. A shorter interval gives a finer time axis but costs more CPU on the machine under test, and an
+interval below the cost of one sample cannot be kept at all (the Profiler raises it to that cost). Samples taken at a
+fixed period can run in lock-step with timers and periodic work of the databases, which biases them, so the gaps
+between samples are drawn from an exponential distribution with the interval as mean. The default is 0.053 s (about
+19 Hz), it can be changed with --interval or the BENCH_INTERVAL environment variable.
+"""
 import sys
+import csv
 import os
 import threading
 import logging
 import psutil
+import numpy as np
 import time
+import random
 import datetime
 from databases import GraphDriver, NEO4j, ArangoDB, OrientDB
 from tkinter import *
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_INTERVAL = float(os.environ.get("BENCH_INTERVAL", 0.053))
+LABELS = ["test"]
 
 
 class Suppress:
@@ -25,30 +43,68 @@ class Suppress:
         info(f"Exiting suppression mode for {self.database}")
 
 
+if sys.platform.startswith("linux"):
+    _CLK_TCK = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGESIZE")
+
+
 class Profiler:
     """
     Monitors the CPU and memory usage of the database.
     """
-    def __init__(self, database: GraphDriver, interval, auto_start=True):
+    def __init__(self, database: GraphDriver, interval, auto_start=True, capacity=1024):
         """
         :param database: The database to monitor
-        :param interval: The interval in seconds between each measurement
+        :param interval: The mean interval in seconds between two measurements
         :param auto_start: Whether to start the profiler automatically
+        :param capacity: The number of samples preallocated, the buffers double whenever they are full
         """
+        self._database = database
         self._pids = database.get_pids()
         if not self._pids:
             error(f"No PIDs found for {database}")
+        self._fast = sys.platform.startswith("linux")
+        if self._fast:
+            # The files stay open and are re-read from offset 0 on every sample
+            self._stat_fds = [os.open(f"/proc/{pid}/stat", os.O_RDONLY) for pid in self._pids]
+            self._statm_fds = [os.open(f"/proc/{pid}/statm", os.O_RDONLY) for pid in self._pids]
+            self._last_ticks = None
+            self._last_time = None
+        else:
+            self._procs = [psutil.Process(pid) for pid in self._pids]
         self._interval = interval
         self._thread = None
         self._running = False
-        self._cpu_usage = []
-        self._memory_usage = []
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._cpu_usage = np.empty(capacity, dtype=np.float32)
+        self._memory_usage = np.empty(capacity, dtype=np.int64)
+        self._n = 0
+        self._start_ns = None
+        self._dropped = 0
+        self._lock = threading.Lock()
+        # The samples the getters return, the whole run until start_segment is called
+        self._segment_name = None
+        self._segment_start = 0
+        self._segment_end = None
+        self._segment_start_ns = 0
+        self._segment_dropped = 0
+        self._segment_cache_hits = 0
+        self._segment_cache_misses = 0
 
         info(f"Profiler initialized for {database} with pids {self._pids}")
         if auto_start:
             self.start()
 
     def start(self):
+        # cpu_percent(None) reports the usage since its previous call, so the first sample only primes the counters.
+        # Its duration is the least time a sample takes, an interval below that cannot be kept.
+        t = time.perf_counter()
+        self._sample()
+        cost = time.perf_counter() - t
+        if cost > self._interval:
+            info(f"Interval {self._interval} s is below the sampling cost of {cost} s, sampling every {cost} s")
+            self._interval = cost
+        self._start_ns = time.perf_counter_ns()
         self._running = True
         self._thread = threading.Thread(target=self._run)
         self._thread.daemon = True
@@ -58,68 +114,193 @@ class Profiler:
     def stop(self):
         self._running = False
         self._thread.join()
+        if self._fast:
+            for fd in self._stat_fds + self._statm_fds:
+                os.close(fd)
         info(f"Profiler stopped")
 
     def _run(self):
-        def cpu_thread(index: int, proc, interval):
-            nonlocal cpu
-            cpu[index] = proc.cpu_percent(interval=interval)
-
+        # Sleep until a deadline instead of a fixed time after each sample, so the cost of sampling does not
+        # stretch the period. The gaps are exponentially distributed (Poisson sampling), which cannot fall in step
+        # with periodic work of the database and keeps the averages unbiased.
+        # Integer nanoseconds keep the deadline exact over long runs.
+        interval_ns = int(self._interval * 1e9)
+        rate = 1 / interval_ns
+        next_t = self._start_ns
         while self._running:
-            cpu_thread_pool = []
-            cpu = [0 for _ in range(len(self._pids))]
-            mem = 0
-
-            for pid in self._pids:
-                p = psutil.Process(pid)
-                cpu_thread_pool.append(threading.Thread(target=cpu_thread, args=(self._pids.index(pid), p, 0.9)))
+            next_t += int(random.expovariate(rate))
+            delay = next_t - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+            elif -delay > interval_ns:
+                # More than one interval behind: skip the missed ticks instead of sampling in a burst
+                missed = -delay // interval_ns
+                self._dropped += missed
+                next_t += missed * interval_ns
+            with self._lock:
+                cpu, mem = self._sample()
+                self._store(time.perf_counter_ns() - self._start_ns, cpu, mem)
+
+    def start_segment(self, name: str):
+        """
+        Starts a new segment of the running measurement. Until the next segment starts, the getters only return
+        the samples taken in this one.
+        :param name: The name of the segment
+        """
+        with self._lock:
+            self._segment_name = name
+            self._segment_start = self._n
+            self._segment_end = None
+            self._segment_start_ns = time.perf_counter_ns() - self._start_ns
+            self._segment_dropped = self._dropped
+            cache = self._database.get_cache()
+            self._segment_cache_hits = cache.get_hits()
+            self._segment_cache_misses = cache.get_misses()
+        info(f"Profiler segment {name} started")
+
+    def stop_segment(self):
+        """
+        Ends the current segment, the sampling itself goes on
+        """
+        with self._lock:
+            if self._n == self._segment_start:
+                # The segment was shorter than one interval, sample now so it is not empty
+                cpu, mem = self._sample()
+                self._store(time.perf_counter_ns() - self._start_ns, cpu, mem)
+            self._segment_end = self._n
+        info(f"Profiler segment {self._segment_name} stopped")
+
+    def _segment(self):
+        return slice(self._segment_start, self._n if self._segment_end is None else self._segment_end)
+
+    def _sample(self):
+        if self._fast:
+            return self._fast_sample()
+        cpu = 0
+        mem = 0
+        for p in self._procs:
+            with p.oneshot():
+                cpu += p.cpu_percent(interval=None)
                 mem += p.memory_info().rss
+        return cpu, mem
 
-            for t in cpu_thread_pool:
-                t.start()
-            for t in cpu_thread_pool:
-                t.join()
-            self._cpu_usage.append(sum(cpu))
-            self._memory_usage.append(mem / 1024 / 1024)
-            time.sleep(self._interval)
+    def _fast_sample(self):
+        """
+        Reads CPU time and RSS straight from /proc, which costs a fraction of the psutil calls per process.
+        """
+        now = time.perf_counter()
+        ticks = 0
+        pages = 0
+        for fd in self._stat_fds:
+            stat = os.pread(fd, 4096, 0)
+            # The process name may contain spaces, the fields after it start with field 3 (state).
+            # utime and stime are fields 14 and 15.
+            fields = stat[stat.rindex(b")") + 2:].split()
+            ticks += int(fields[11]) + int(fields[12])
+        for fd in self._statm_fds:
+            pages += int(os.pread(fd, 4096, 0).split()[1])
+        cpu = 0
+        if self._last_time is not None:
+            cpu = (ticks - self._last_ticks) / _CLK_TCK / (now - self._last_time) * 100
+        self._last_ticks = ticks
+        self._last_time = now
+        return cpu, pages * _PAGE_SIZE
+
+    def _store(self, timestamp, cpu, mem):
+        if self._n == len(self._cpu_usage):
+            self._timestamps = np.resize(self._timestamps, 2 * self._n)
+            self._cpu_usage = np.resize(self._cpu_usage, 2 * self._n)
+            self._memory_usage = np.resize(self._memory_usage, 2 * self._n)
+        self._timestamps[self._n] = timestamp
+        self._cpu_usage[self._n] = cpu
+        self._memory_usage[self._n] = mem
+        self._n += 1
+
+    def get_timestamps(self):
+        """
+        :return: The time of each sample in seconds since the segment was started
+        """
+        return (self._timestamps[self._segment()] - self._segment_start_ns) / 1e9
+
+    def get_dropped_samples(self):
+        return self._dropped - self._segment_dropped
+
+    def get_cache_lookups(self):
+        """
+        :return: The hits and misses of the driver's query cache since the segment was started
+        """
+        cache = self._database.get_cache()
+        return cache.get_hits() - self._segment_cache_hits, cache.get_misses() - self._segment_cache_misses
 
     def get_cpu_usage(self):
-        return self._cpu_usage
+        return self._cpu_usage[self._segment()]
 
     def get_memory_usage(self):
-        return self._memory_usage
+        return self._memory_usage[self._segment()] / 1024 / 1024
 
     def get_average_cpu_usage(self):
-        return sum(self._cpu_usage) / len(self._cpu_usage)
+        return float(self.get_cpu_usage().mean())
 
     def get_average_memory_usage(self):
-        return sum(self._memory_usage) / len(self._memory_usage)
+        return float(self.get_memory_usage().mean())
 
     def get_summary(self):
-        return f"CPU average: {sum(self._cpu_usage) / len(self._cpu_usage)} %, " \
-               f"MEM average: {sum(self._memory_usage) / len(self._memory_usage)} MB"
+        summary = f"CPU average: {self.get_average_cpu_usage()} %, " \
+                  f"MEM average: {self.get_average_memory_usage()} MB"
+        if self.get_dropped_samples():
+            summary += f", {self.get_dropped_samples()} samples dropped"
+        hits, misses = self.get_cache_lookups()
+        if hits + misses:
+            summary += f", cache hit rate: {hits / (hits + misses):.1%}"
+        return summary
 
 
-def bench_add_single_node(database: GraphDriver, size=10000):
+def node_rows(size=10000, **_):
+    """
+    Builds the rows bench_add_single_node inserts, so they can be prepared before the measurement starts
+    :param size: Number of nodes
+    """
+    return [{"id": f"{i}", "name": f"test{i}"} for i in range(size)]
+
+
+def edge_rows(size=1000, **_):
+    """
+    Builds the rows bench_add_single_edge inserts, so they can be prepared before the measurement starts
+    :param size: Number of nodes the edges connect
+    """
+    return [{"src": f"{i}", "dst": f"{i + 1}", "name": f"test{i}"} for i in range(size - 1)]
+
+
+def bench_add_single_node(database: GraphDriver, size=10000, batch_size=1000, rows=None):
     """
     Adds size nodes to the database
     :param database: The database to add the nodes to
     :param size: Number of nodes to add
+    :param batch_size: Number of nodes sent to the database per query
+    :param rows: The nodes from node_rows, built here if not given
     """
     info(f"Adding {size} nodes to {database}")
-    for i in range(size):
-        database.add_node(nid=i, labels=["test"], properties={"name": f"test{i}"})
+    if rows is None:
+        rows = node_rows(size)
+    with database.bulk_tx():
+        for i in range(0, len(rows), batch_size):
+            database.add_nodes_batch(rows[i:i + batch_size])
 
 
-def bench_add_single_edge(database: GraphDriver, size=1000):
+def bench_add_single_edge(database: GraphDriver, size=1000, batch_size=1000, rows=None):
     """
     Adds size edges to the database
     :param database: The database to add the edges to
     :param size: Number of edges to add
+    :param batch_size: Number of edges sent to the database per query
+    :param rows: The edges from edge_rows, built here if not given
     """
     info(f"Adding {size} edges to {database}")
-    for i in range(size - 1):
-        database.add_edge(src=f"{i}", dst=f"{i + 1}", labels=["test"], properties={"name": f"test{i}"})
+    if rows is None:
+        rows = edge_rows(size)
+    with database.bulk_tx():
+        for i in range(0, len(rows), batch_size):
+            database.add_edges_batch(rows[i:i + batch_size])
 
 
 def bench_add_database(database: GraphDriver, path_node: str = "data_sets/Wiki-VoteN.txt",
@@ -135,34 +316,73 @@ def bench_add_database(database: GraphDriver, path_node: str = "data_sets/Wiki-V
         database.load_database(path_node, path_edge)
 
 
-def bench_get_single_node(database: GraphDriver, size=1000):
+def bench_import_database(database: GraphDriver, path_node: str = "data_sets/Wiki-VoteN.txt",
+                          path_edge: str = "data_sets/Wiki-VoteE.txt"):
+    """
+    Imports the nodes and edges from the given files with the database's own bulk import
+    :param database: The database to import the nodes and edges into
+    :param path_node: Path to the file containing the nodes, as seen by the database server
+    :param path_edge: Path to the file containing the edges, as seen by the database server
+    """
+    info(f"Importing database from {path_node} and {path_edge} into {database}")
+    if database:
+        database.import_database(path_node, path_edge)
+
+
+def bench_get_single_node(database: GraphDriver, size=1000, distinct=None):
     """
     queries size nodes from the database
     :param database: The database to query the nodes from
     :param size: Number of nodes to query
+    :param distinct: Number of different nodes the queries cycle through, all of them differ if not given
     """
     info(f"Getting {size} nodes from {database}")
+    distinct = distinct or size
+    properties = {}
+    for i in range(size):
+        if database:
+            properties["name"] = f"test{i % distinct}"
+            database.get_single_node(labels=LABELS, properties=properties)
+
+
+def bench_get_single_node_cached(database: GraphDriver, size=1000, distinct=100):
+    """
+    queries size nodes from the database through the driver's query cache. The queries cycle through distinct nodes,
+    so only the first query of each node goes to the database.
+    Compare with bench_get_single_node for the same size and distinct.
+    :param database: The database to query the nodes from
+    :param size: Number of nodes to query
+    :param distinct: Number of different nodes the queries cycle through
+    """
+    info(f"Getting {size} nodes from {database} through the query cache")
     for i in range(size):
         if database:
-            database.get_single_node(labels=["test"], properties={"name": f"test{i}"})
+            database.get_single_node_cached(labels=("test",), properties=(("name", f"test{i % distinct}"),))
 
 
-def create_gird_graph(database: GraphDriver, size=150):
+def create_gird_graph(database: GraphDriver, size=150, batch_size=1000):
     """
     Creates a grid graph with size * size nodes
     :param database: The database to add the nodes and edges to
     :param size: The size of the grid
+    :param batch_size: Number of nodes or edges sent to the database per query
     """
     info(f"Creating grid graph with {size} nodes in {database}")
-    for i in range(size ** 2):
-        database.add_node(nid=i, labels=["test"], properties={"name": f"test{i}"})
-    for i in range(size ** 2):
+    with database.bulk_tx():
+        nodes = node_rows(size ** 2)
+        for i in range(0, len(nodes), batch_size):
+            database.add_nodes_batch(nodes[i:i + batch_size])
 
-        if i % size != size - 1:
-            database.add_edge(src=f"{i}", dst=f"{i + 1}", labels=["test"], properties={"name": f"test{i}"})
+        edges = []
+        for i in range(size ** 2):
 
-        if i < size ** 2 - size:
-            database.add_edge(src=f"{i}", dst=f"{i + size}", labels=["test"], properties={"name": f"test{i}"})
+            if i % size != size - 1:
+                edges.append({"src": f"{i}", "dst": f"{i + 1}", "name": f"test{i}"})
+
+            if i < size ** 2 - size:
+                edges.append({"src": f"{i}", "dst": f"{i + size}", "name": f"test{i}"})
+        for i in range(0, len(edges), batch_size):
+            database.add_edges_batch(edges[i:i + batch_size])
 
 
 def bench_traversal(database: GraphDriver, start_node=1, size=10):
@@ -200,46 +420,82 @@ def bench_idle_usage(database: GraphDriver, duration=60):
     time.sleep(duration)
 
 
-def perform_bench(bench: callable, database, save=True, **kwargs):
+# Builds the rows a benchmark inserts before its measurement starts
+_prepare = {bench_add_single_node: node_rows, bench_add_single_edge: edge_rows}
+_overheads = {}
+_profilers = {}
+
+
+def get_profiler(database: GraphDriver, interval):
+    """
+    Returns the profiler of the database. It is started on first use and keeps sampling for the rest of the process,
+    the benchmarks only mark their segments in it.
+    :param database: The database to monitor
+    :param interval: The mean interval in seconds between two measurements
+    """
+    if (database, interval) not in _profilers:
+        _profilers[database, interval] = Profiler(database, interval)
+    return _profilers[database, interval]
+
+
+def get_overhead(database: GraphDriver, n=1000):
+    """
+    Measures the client-side time of a single driver call, i.e. everything but the database itself. The result is
+    measured once per database and then reused.
+    :param database: The database to measure the overhead for
+    :param n: Number of suppressed calls to average over
+    :return: The overhead of one call in seconds
+    """
+    if database not in _overheads:
+        with Suppress(database):
+            start = time.perf_counter()
+            for i in range(n):
+                database.get_single_node(labels=["test"], properties={"name": f"test{i}"})
+            end = time.perf_counter()
+        _overheads[database] = (end - start) / n
+        info(f"Overhead of {database} is {_overheads[database]} s per query")
+    return _overheads[database]
+
+
+def perform_bench(bench: callable, database, save=True, interval=DEFAULT_INTERVAL, **kwargs):
     """
     Performs the given benchmark on the given database
     :param bench: The benchmark to perform
     :param database: The database to perform the benchmark on
     :param save: Whether to save the results
+    :param interval: The mean interval in seconds between two measurements of the profiler
     :param kwargs: The arguments to pass to the benchmark
     :return: The results of the benchmark
     """
-    # Get overhead
     info(f"Starting benchmark {bench.__name__} with {database}")
-    start = time.time()
-    with Suppress(database):
-        bench(database, **kwargs)
-    end = time.time()
-    overhead = end - start
-    info(f"Overhead is {overhead}")
-
-    # Perform benchmark
-    profiler = Profiler(database, 0.1)
-    start = time.time()
+    overhead = get_overhead(database)
+    if bench in _prepare and "rows" not in kwargs:
+        kwargs["rows"] = _prepare[bench](**kwargs)
+    profiler = get_profiler(database, interval)
+    profiler.start_segment(f"{bench.__name__}_{database}")
+    queries = database.get_query_count()
+    start = time.perf_counter()
     bench(database, **kwargs)
-    end = time.time()
-    profiler.stop()
-    duration = end - start - overhead
+    end = time.perf_counter()
+    profiler.stop_segment()
+    queries = database.get_query_count() - queries
+    duration = end - start - queries * overhead
     info(f"Benchmark {bench.__name__} with {database} finished in {duration}")
     info(profiler.get_summary())
     if save:
         save_data(f"{bench.__name__}_{database}", ["_Time [s]", "CPU [%]", "MEM [MB]"],
-                  [i for i in range(len(profiler.get_cpu_usage()))],
+                  profiler.get_timestamps(),
                   profiler.get_cpu_usage(), profiler.get_memory_usage())
     else:
         return profiler.get_average_cpu_usage(), profiler.get_average_memory_usage(), duration
 
 
-def iterate_bench(bench: callable, database, **kwargs):
+def iterate_bench(bench: callable, database, interval=DEFAULT_INTERVAL, **kwargs):
     """
     Iterates the given benchmark on the given database
     :param bench: The benchmark to iterate
     :param database: The database to iterate the benchmark on
+    :param interval: The mean interval in seconds between two measurements of the profiler
     :param kwargs: One kwarg must be a list of values to iterate over. Rest is passed to the benchmark.
     """
     values = []
@@ -253,7 +509,7 @@ def iterate_bench(bench: callable, database, **kwargs):
             for value in kwargs[arg]:
                 new_kwargs = kwargs.copy()
                 new_kwargs[arg] = value
-                res = perform_bench(bench, database, save=False, **new_kwargs)
+                res = perform_bench(bench, database, save=False, interval=interval, **new_kwargs)
                 values.append(value)
                 cpu_usage.append(res[0])
                 memory_usage.append(res[1])
@@ -273,12 +529,10 @@ def save_data(name, head, *args):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     name = f"Results/{name}_{timestamp}.bench"
     info(f"Saving data to {name}")
-    with open(name, "w") as f:
-        f.write(",".join(head) + "\n")
-        for i in range(len(args[0])):
-            for arg in args:
-                f.write(f"{arg[i]},")
-            f.write("\n")
+    with open(name, "w", newline="", buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(head)
+        writer.writerows(zip(*args))
 
 
 def selection_window():
@@ -287,8 +541,9 @@ def selection_window():
     :return: The selected benchmark, databases, whether to iterate,
     the amount of steps and a factor and whether to clear the databases
     """
-    benchmarks = [bench_add_single_node, bench_add_single_edge, bench_add_database, bench_get_single_node,
-                  bench_idle_usage, bench_traversal, create_gird_graph, bench_spp]
+    benchmarks = [bench_add_single_node, bench_add_single_edge, bench_add_database, bench_import_database,
+                  bench_get_single_node, bench_get_single_node_cached, bench_idle_usage, bench_traversal,
+                  create_gird_graph, bench_spp]
     databases = [NEO4j, OrientDB, ArangoDB]
     root = Tk()
     root.title("Benchmark")
@@ -339,6 +594,14 @@ def selection_window():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark graph databases")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="Seconds between two profiler samples (default: %(default)s)")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Benchmark the selected databases at the same time. Saves wall time, but the databases "
+                             "then share the machine, which shows in their CPU and memory usage")
+    args = parser.parse_args()
+
     logging.basicConfig(filename="benchmark.log", level=logging.INFO,
                         format="%(asctime)s - %(levelname)s - %(message)s")
     info = logging.info
@@ -347,35 +610,34 @@ if __name__ == "__main__":
 
     settings = selection_window()
 
-    d_neo4j = None
-    d_arango = None
-    d_orient = None
-    for db in settings[1]:
-        if db == NEO4j:
-            try:
-                d_neo4j = NEO4j("bolt://localhost:7687", "neo4j", "1234")
-                if settings[5]:
-                    d_neo4j.clear()
-            except Exception as e:
-                error(f"Could not connect to Neo4j: {e}")
-        elif db == ArangoDB:
-            try:
-                d_arango = ArangoDB("http://localhost:8529", "root", "arango")
-                if settings[5]:
-                    d_arango.clear()
-            except Exception as e:
-                error(f"Could not connect to ArangoDB: {e}")
-        elif db == OrientDB:
-            try:
-                d_orient = OrientDB("localhost", "root", "orient")
-                if settings[5]:
-                    d_orient.clear()
-            except Exception as e:
-                error(f"Could not connect to OrientDB: {e}")
-
-    for db in [d_neo4j, d_arango, d_orient]:
-        if db is not None:
-            if settings[2]:
-                iterate_bench(globals()[settings[0]], db, size=[i * settings[4] for i in range(1, settings[3] + 1)])
-            else:
-                perform_bench(globals()[settings[0]], db)
+    connections = {
+        NEO4j: ("bolt://localhost:7687", "neo4j", "1234"),
+        ArangoDB: ("http://localhost:8529", "root", "arango"),
+        OrientDB: ("localhost", "root", "orient"),
+    }
+    connected = []
+    for db_class, credentials in connections.items():
+        if db_class not in settings[1]:
+            continue
+        try:
+            db = db_class(*credentials)
+            connected.append(db)
+            if settings[5]:
+                db.clear()
+        except Exception as e:
+            error(f"Could not connect to {db_class.__str__(None)}: {e}")
+
+    def run(db):
+        if settings[2]:
+            iterate_bench(globals()[settings[0]], db, interval=args.interval,
+                          size=[i * settings[4] for i in range(1, settings[3] + 1)])
+        else:
+            perform_bench(globals()[settings[0]], db, interval=args.interval)
+
+    if args.parallel and connected:
+        # The client mostly waits on the servers, so one thread per database is enough to overlap them
+        with ThreadPoolExecutor(max_workers=len(connected)) as executor:
+            list(executor.map(run, connected))
+    else:
+        for db in connected:
+            run(db)
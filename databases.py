@@ -1,12 +1,143 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import functools
+import itertools
+import json
+import socket
+import threading
 import psutil
 from neo4j import GraphDatabase
+from neo4j.exceptions import CypherSyntaxError, Neo4jError
 from pyArango.connection import *
+from pyArango.theExceptions import CreationError
 import pyorient
 
+# Number of nodes or edges sent to the database in one query when loading in bulk
+BATCH_SIZE = 1000
+
+# Cypher used by the NEO4j driver. Values are always passed as parameters, only labels ({labels}) and property keys
+# ({keys}) are filled into the text, so every call with the same labels and keys reuses the cached query plan.
+Q_ADD_NODE = "CREATE (n{labels} $props)"
+Q_ADD_EDGE = "MATCH (a:test {{id: $src}}), (b:test {{id: $dst}}) CREATE (a)-[r{labels} $props]->(b)"
+Q_ADD_NODES = "UNWIND $rows AS r CREATE (n:test) SET n = r"
+Q_ADD_EDGES = "UNWIND $rows AS r MATCH (a:test {id: r.src}), (b:test {id: r.dst}) " \
+              "CREATE (a)-[e:test]->(b) SET e = r REMOVE e.src, e.dst"
+Q_GET_NODE = "MATCH (n{labels} {{{keys}}}) RETURN n"
+# The hop count of a variable length pattern cannot be a parameter, APOC's expander takes it as one
+Q_HOPS = "MATCH (n:test {id: $id}) " \
+         "CALL apoc.path.subgraphNodes(n, {minLevel: 1, maxLevel: $hops, relationshipFilter: \">\"}) " \
+         "YIELD node RETURN node"
+Q_SSP = "MATCH (a:test {id: $src}), (b:test {id: $dst}) MATCH p = shortestPath((a)-[*]->(b)) RETURN p"
+# The server streams the file ($file, relative to its import directory) and commits every 10000 rows, so memory stays
+# bounded. CALL {} IN TRANSACTIONS needs Neo4j 4.4, older servers use PERIODIC COMMIT and APOC instead.
+Q_IMPORT_NODES = "LOAD CSV FROM $file AS row CALL { WITH row CREATE (n:test {id: row[0], test: \"test\"}) } " \
+                 "IN TRANSACTIONS OF 10000 ROWS"
+Q_IMPORT_EDGES = "LOAD CSV FROM $file AS row FIELDTERMINATOR '\\t' CALL { WITH row " \
+                 "MATCH (a:test {id: row[0]}), (b:test {id: row[1]}) CREATE (a)-[:test {test: \"test\"}]->(b) } " \
+                 "IN TRANSACTIONS OF 10000 ROWS"
+Q_IMPORT_NODES_LEGACY = "USING PERIODIC COMMIT 10000 LOAD CSV FROM $file AS row " \
+                        "CREATE (n:test {id: row[0], test: \"test\"})"
+# Not parallel: edges sharing a node would fight over its lock
+Q_IMPORT_EDGES_LEGACY = "CALL apoc.periodic.iterate(" \
+                        "\"LOAD CSV FROM $file AS row FIELDTERMINATOR '\\\\t' RETURN row\", " \
+                        "\"MATCH (a:test {id: row[0]}), (b:test {id: row[1]}) CREATE (a)-[:test {test: 'test'}]->(b)\", " \
+                        "{batchSize: 10000, parallel: false, params: {file: $file}})"
+
+
+def _batched(iterable, size: int):
+    """
+    Split an iterable into lists of at most size elements
+    """
+    it = iter(iterable)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def _read_nodes(path: str):
+    """
+    Yield the ids of a nodes file, streamed line by line. Lines starting with # are skipped.
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if not line.startswith("#"):
+                yield line.strip()
+
+
+def _read_edges(path: str):
+    """
+    Yield the (src, dst) pairs of a tab separated edges file, streamed line by line. Lines starting with # are skipped.
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if not line.startswith("#"):
+                yield line.strip().split("\t")
+
+
+def _parallel(func: callable, batches, workers: int):
+    """
+    Call func on every batch from a pool of workers threads. At most 2 * workers batches are taken from batches at a
+    time, so a file streamed into batches is not read into memory at once.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for window in _batched(batches, 2 * workers):
+            list(executor.map(func, window))
+
+
+def _skip_if_suppressed(method):
+    """
+    Make a driver method return None right away while the driver is suppressed, before it builds any query
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._suppressed:
+            return None
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class QueryCache:
+    """
+    LRU cache for the results of read queries that counts its hits and misses
+    """
+
+    def __init__(self, func: callable, maxsize=1024):
+        """
+        :param func: The query to cache, all of its arguments must be hashable
+        :param maxsize: The maximum number of cached results
+        """
+        self._func = functools.lru_cache(maxsize=maxsize)(func)
+        self._hits = 0
+        self._misses = 0
+
+    def __call__(self, *args):
+        return self._func(*args)
+
+    def clear(self):
+        """
+        Drop all cached results, the hit and miss counters are kept
+        """
+        cache_info = self._func.cache_info()
+        self._hits += cache_info.hits
+        self._misses += cache_info.misses
+        self._func.cache_clear()
+
+    def get_hits(self):
+        return self._hits + self._func.cache_info().hits
+
+    def get_misses(self):
+        return self._misses + self._func.cache_info().misses
+
+    def get_hit_rate(self):
+        lookups = self.get_hits() + self.get_misses()
+        return self.get_hits() / lookups if lookups else 0.0
+
 
 class GraphDriver:
     def __init__(self):
         self._suppressed = False
+        self._query_count = 0
+        self._pids = None
+        self._node_cache = QueryCache(self._get_single_node_list)
 
     def add_node(self, nid: int, labels: list[str], properties: dict):
         """
@@ -27,6 +158,27 @@ class GraphDriver:
         """
         raise NotImplementedError
 
+    def add_nodes_batch(self, rows: list[dict]):
+        """
+        Add multiple nodes to the database. Drivers that support it send the whole batch in one query.
+        :param rows: The nodes to add, each a dict with the node id under "id" and the remaining properties
+        """
+        for row in rows:
+            properties = row.copy()
+            nid = properties.pop("id")
+            self.add_node(nid, ["test"], properties)
+
+    def add_edges_batch(self, rows: list[dict]):
+        """
+        Add multiple edges to the database. Drivers that support it send the whole batch in one query.
+        :param rows: The edges to add, each a dict with "src" and "dst" and the remaining properties
+        """
+        for row in rows:
+            properties = row.copy()
+            src = properties.pop("src")
+            dst = properties.pop("dst")
+            self.add_edge(src, dst, ["test"], properties)
+
     def get_single_node(self, labels: list[str], properties: dict):
         """
         Get a single node that matches the given labels and properties
@@ -35,6 +187,33 @@ class GraphDriver:
         """
         raise NotImplementedError
 
+    def get_single_node_cached(self, labels: tuple, properties: tuple):
+        """
+        Like get_single_node, but repeated lookups are answered from a cache that every write of the driver resets
+        :param labels: The labels of the node
+        :param properties: The properties of the node as (key, value) pairs
+        """
+        if self._suppressed:
+            return self._get_single_node_list(labels, properties)
+        return self._node_cache(labels, properties)
+
+    def _get_single_node_list(self, labels: tuple, properties: tuple):
+        # The cache has to hold the records themselves: ArangoDB returns a cursor, which is used up after one pass
+        res = self.get_single_node(list(labels), dict(properties))
+        return list(res) if res is not None else None
+
+    def get_query_count(self):
+        """
+        Get the number of queries the driver has sent to the database
+        """
+        return self._query_count
+
+    def get_cache(self):
+        """
+        Get the cache used by get_single_node_cached
+        """
+        return self._node_cache
+
     def get_nodes_hops(self, node_id: int, hops: int):
         """
         Get all nodes that are at most hops away from the given node
@@ -51,20 +230,65 @@ class GraphDriver:
         """
         raise NotImplementedError
 
-    def load_database(self, path_nodes: str, path_edges: str):
+    def load_database(self, path_nodes: str, path_edges: str, batch_size: int = BATCH_SIZE):
         """
-        Load the database from the given files
+        Load the database from the given files, sending batch_size nodes or edges per query
         :param path_nodes: The path to the nodes file
         :param path_edges: The path to the edges file
+        :param batch_size: Number of nodes or edges per query
         """
-        raise NotImplementedError
+        for rows in _batched(({"id": nid, "test": "test"} for nid in _read_nodes(path_nodes)), batch_size):
+            self.add_nodes_batch(rows)
+        edges = _read_edges(path_edges)
+        for rows in _batched(({"src": src, "dst": dst, "test": "test"} for src, dst in edges), batch_size):
+            self.add_edges_batch(rows)
+
+    def import_database(self, path_nodes: str, path_edges: str):
+        """
+        Load the database from the given files with the database's own bulk import, if it has one. The paths are
+        then resolved by the database server. Drivers without a bulk import fall back to load_database.
+        :param path_nodes: The path to the nodes file
+        :param path_edges: The path to the edges file
+        """
+        self.load_database(path_nodes, path_edges)
 
     def get_pids(self):
         """
-        Get the pids of the processes that are related to the database
+        Get the pids of the processes that are related to the database. The processes are only searched until they
+        are found, later calls return the same pids.
+        """
+        if not self._pids:
+            self._pids = self._find_pids()
+        return self._pids
+
+    def _find_pids(self):
+        """
+        Search the processes of the database
         """
         raise NotImplementedError
 
+    def ensure_index(self):
+        """
+        Create the indexes on the node id and name that add_edge and the lookups rely on, if the database has none
+        yet. The drivers call it once when they connect. The indexes are not unique, because the benchmarks insert
+        the same ids again on every run. The name index is there because get_single_node looks nodes up by name.
+        """
+        pass
+
+    @contextmanager
+    def bulk_tx(self):
+        """
+        Group all writes issued inside the with-block into as few transactions as the driver supports.
+        Drivers without explicit transactions execute every query on its own.
+        """
+        yield
+
+    def flush(self):
+        """
+        Commit everything the driver still holds back
+        """
+        pass
+
     def enter_suppression(self):
         """
         Enter suppression mode. The driver will not send any queries to the database.
@@ -83,75 +307,261 @@ class NEO4j(GraphDriver):
     Driver for Neo4j
     """
 
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, pool_size=32, connection_acquisition_timeout=5,
+                 max_connection_lifetime=3600, fetch_size=1000):
+        """
+        :param pool_size: The maximum number of connections the driver keeps open
+        :param connection_acquisition_timeout: Seconds to wait for a free connection from the pool
+        :param max_connection_lifetime: Seconds after which a pooled connection is replaced
+        :param fetch_size: The number of records fetched from the server per round-trip
+        """
         super().__init__()
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-
+        self.driver = GraphDatabase.driver(uri, auth=(user, password), max_connection_pool_size=pool_size,
+                                           connection_acquisition_timeout=connection_acquisition_timeout,
+                                           max_connection_lifetime=max_connection_lifetime, keep_alive=True)
+        self._session = self.driver.session(fetch_size=fetch_size)
+        self._tx = None
+        self._tx_ops = 0
+        self._commit_every = None
+        self.ensure_index()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _render(template: str, labels: tuple, keys: tuple = ()):
+        # Labels and relationship types cannot be passed as parameters, so they are the only part of the query
+        # text that may vary. Keep them in a stable order so identical calls produce identical (plan-cached) text.
+        # The benchmarks use the same few labels and keys on every call, so each text is only built once.
+        return template.format(labels="".join(f":{label}" for label in labels),
+                               keys=", ".join(f"{k}: ${k}" for k in keys))
+
+    @_skip_if_suppressed
     def add_node(self, nid: int, labels: list[str], properties: dict):
-        properties.update({"id": nid})
-        q = "CREATE (n"
-        if labels:
-            q += ":" + ":".join(labels)
-        q += " {"
-        q += ", ".join([f"{k}: \"{v}\"" for k, v in properties.items()])
-        q += "}"
-        q += ")"
-        self.query(q)
+        self._node_cache.clear()
+        q = self._render(Q_ADD_NODE, tuple(labels))
+        self.write(q, {"props": {**properties, "id": f"{nid}"}})
 
+    @_skip_if_suppressed
     def add_edge(self, src: str, dst: str, labels: list[str], properties: dict):
-        q = f"MATCH (a), (b) WHERE a.id = \"{src}\" AND b.id = \"{dst}\" CREATE (a)-[:"
-        if labels:
-            q += ":".join(labels)
-        q += " {"
-        q += ", ".join([f"{k}: \"{v}\"" for k, v in properties.items()])
-        q += "}"
-        q += "]->(b)"
-        self.query(q)
+        self._node_cache.clear()
+        q = self._render(Q_ADD_EDGE, tuple(labels))
+        self.write(q, {"src": f"{src}", "dst": f"{dst}", "props": properties})
+
+    @_skip_if_suppressed
+    def add_nodes_batch(self, rows: list[dict]):
+        self._node_cache.clear()
+        self.write(Q_ADD_NODES, {"rows": rows})
+
+    @_skip_if_suppressed
+    def add_edges_batch(self, rows: list[dict]):
+        self._node_cache.clear()
+        self.write(Q_ADD_EDGES, {"rows": rows})
 
+    @_skip_if_suppressed
     def get_single_node(self, labels: list[str], properties: dict):
-        q = "MATCH (n"
-        if labels:
-            q += ":" + ":".join(labels)
-        q += " {"
-        q += ", ".join([f"{k}: \"{v}\"" for k, v in properties.items()])
-        q += "}"
-        q += ") RETURN n"
-        return self.query(q)
+        q = self._render(Q_GET_NODE, tuple(labels), tuple(properties))
+        return self.query(q, properties)
 
+    @_skip_if_suppressed
     def get_nodes_hops(self, node_id, hops):
-        q = f"MATCH (n)-[*1..{hops}]->(m) WHERE n.id = \"{node_id}\" RETURN DISTINCT m"
-        return self.query(q)
+        return self.query(Q_HOPS, {"id": f"{node_id}", "hops": hops})
 
+    @_skip_if_suppressed
     def ssp(self, src, dst):
-        q = f"MATCH p=shortestPath((a)-[*]->(b)) WHERE a.id = \"{src}\" AND b.id = \"{dst}\" RETURN p"
-        return self.query(q)
+        return self.query(Q_SSP, {"src": f"{src}", "dst": f"{dst}"})
 
-    def load_database(self, path_nodes: str, path_edges: str):
-        with open(path_nodes, "r") as f:
-            for line in f:
-                nid = int(line.strip())
-                self.add_node(nid, ["test"], {"test": "test"})
-        with open(path_edges, "r") as f:
-            for line in f:
-                src, dst = line.strip().split("\t")
-                self.add_edge(src, dst, ["test"], {"test": "test"})
+    def load_database(self, path_nodes: str, path_edges: str, batch_size: int = 10000, commit_every: int = 10,
+                      workers: int = 1):
+        """
+        :param commit_every: Number of batches per transaction
+        :param workers: Number of sessions the edges are sent over at the same time
+        """
+        # UNWIND sends a whole batch as one parameter. Each batch still waits for its own round-trip, because run
+        # blocks until the server answers it. Sharing one transaction only saves the commits, which happen every
+        # commit_every batches.
+        if workers <= 1:
+            with self.bulk_tx(commit_every):
+                super().load_database(path_nodes, path_edges, batch_size)
+            return
+        with self.bulk_tx(commit_every):
+            for rows in _batched(({"id": nid, "test": "test"} for nid in _read_nodes(path_nodes)), batch_size):
+                self.add_nodes_batch(rows)
+        if self._suppressed:
+            return
+        self._node_cache.clear()
+        # Every worker thread gets its own session. Edges of different batches can share a node and deadlock on its
+        # lock, execute_write retries the batch that lost.
+        local = threading.local()
+        sessions = []
+
+        def send(rows):
+            if not hasattr(local, "session"):
+                local.session = self.driver.session()
+                sessions.append(local.session)
+            self._query_count += 1
+            local.session.execute_write(lambda tx: tx.run(Q_ADD_EDGES, {"rows": rows}).consume())
+
+        try:
+            edges = _read_edges(path_edges)
+            batches = _batched(({"src": src, "dst": dst, "test": "test"} for src, dst in edges), batch_size)
+            _parallel(send, batches, workers)
+        finally:
+            for session in sessions:
+                session.close()
+
+    def import_database(self, path_nodes: str, path_edges: str):
+        # The paths are relative to the import directory of the server
+        self._node_cache.clear()
+        nodes = {"file": f"file:///{path_nodes}"}
+        edges = {"file": f"file:///{path_edges}"}
+        try:
+            self.autocommit(Q_IMPORT_NODES, nodes)
+        except CypherSyntaxError:
+            # Neo4j before 4.4 cannot parse CALL {} IN TRANSACTIONS, so nothing was imported yet. Any other error (a
+            # missing file, a failure after some batches were committed) is raised as it is.
+            self.autocommit(Q_IMPORT_NODES_LEGACY, nodes)
+            self.autocommit(Q_IMPORT_EDGES_LEGACY, edges)
+        else:
+            self.autocommit(Q_IMPORT_EDGES, edges)
 
     def close(self):
+        self.flush()
+        self._session.close()
         self.driver.close()
 
-    def query(self, q):
-        with self.driver.session() as session:
-            res = None
-            if not self._suppressed:
-                res = session.run(q)
-            return res
+    def query(self, q, params: dict = None):
+        """
+        Run a read query. The records are fetched before returning, so the result stays usable after the next query.
+        :return: The list of records
+        """
+        res = None
+        if not self._suppressed:
+            self._query_count += 1
+            runner = self._session if self._tx is None else self._tx
+            res = list(runner.run(q, params))
+        return res
+
+    def write(self, q, params: dict = None):
+        """
+        Run a write query. Inside bulk_tx the result is left to the transaction commit, otherwise the query runs in
+        a managed write transaction and is consumed right away.
+        :return: The ResultSummary, or None inside bulk_tx
+        """
+        res = None
+        if not self._suppressed:
+            self._query_count += 1
+            if self._tx is None:
+                res = self._session.execute_write(lambda tx: tx.run(q, params).consume())
+            else:
+                self._tx.run(q, params)
+                self._tx_ops += 1
+                if self._tx_ops >= self._commit_every:
+                    self._tx.commit()
+                    self._tx = self._session.begin_transaction()
+                    self._tx_ops = 0
+        return res
+
+    def autocommit(self, q, params: dict = None):
+        """
+        Run a query in its own auto-commit transaction. Needed for queries that commit by themselves, like
+        USING PERIODIC COMMIT or apoc.periodic.iterate.
+        :return: The ResultSummary
+        """
+        res = None
+        if not self._suppressed:
+            self._query_count += 1
+            res = self._session.run(q, params).consume()
+        return res
+
+    def begin_batch(self, commit_every=10000):
+        """
+        Run all following queries in one explicit transaction that is committed every commit_every queries,
+        until flush is called.
+        :param commit_every: The number of queries after which the transaction is committed
+        """
+        if self._tx is None:
+            self._tx = self._session.begin_transaction()
+            self._tx_ops = 0
+        self._commit_every = commit_every
+
+    def flush(self):
+        if self._tx is not None:
+            try:
+                self._tx.commit()
+            finally:
+                self._tx.close()
+                self._tx = None
+
+    @contextmanager
+    def bulk_tx(self, commit_every=10000):
+        """
+        Run all queries inside the with-block in one explicit transaction, committing every commit_every queries
+        and once more when the block is left.
+        :param commit_every: The number of queries after which the transaction is committed
+        """
+        self.begin_batch(commit_every)
+        try:
+            yield
+        except Exception:
+            self._tx.rollback()
+            self._tx.close()
+            self._tx = None
+            raise
+        self.flush()
 
     def clear(self):
-        self.query("MATCH (n) DETACH DELETE n")
+        self._node_cache.clear()
+        self.write("MATCH (n) DETACH DELETE n")
 
-    def get_pids(self):
-        return [p.pid for p in psutil.process_iter() if p.name() == "java.exe" and
-                "Neo4j Desktop.exe" in [pp.name() for pp in p.parents()]]
+    def ensure_index(self):
+        for key in ("id", "name"):
+            try:
+                self.write(f"CREATE INDEX test_{key} IF NOT EXISTS FOR (n:test) ON (n.{key})")
+            except CypherSyntaxError:
+                # Neo4j 3.x syntax
+                self.write(f"CREATE INDEX ON :test({key})")
+
+    def _find_pids(self):
+        # One process_iter pass fetches name and ppid of every process, the ancestors are then walked in the snapshot
+        # instead of calling name() on each parent
+        procs = {p.pid: p.info for p in psutil.process_iter(["name", "ppid"])}
+        pids = []
+        for pid, p_info in procs.items():
+            if p_info["name"] != "java.exe":
+                continue
+            ppid = p_info["ppid"]
+            seen = set()
+            while ppid in procs and ppid not in seen:
+                if procs[ppid]["name"] == "Neo4j Desktop.exe":
+                    pids.append(pid)
+                    break
+                seen.add(ppid)
+                ppid = procs[ppid]["ppid"]
+        if not pids:
+            pids = self._server_pids()
+        return pids
+
+    def _server_pids(self):
+        """
+        Ask the server for its own pid. The JVM runtime bean is named "<pid>@<host>". The pid is only used if the
+        server runs on this host and outside a container, i.e. if the host names match and the pid is a java process.
+        """
+        try:
+            res = self.query("CALL dbms.queryJmx(\"java.lang:type=Runtime\") YIELD attributes "
+                             "RETURN attributes.Name.value AS name")
+        except Neo4jError:
+            return []
+        if not res:
+            return []
+        pid, _, host = res[0]["name"].partition("@")
+        if host != socket.gethostname():
+            return []
+        try:
+            pid = int(pid)
+            if not psutil.Process(pid).name().startswith("java"):
+                return []
+        except (ValueError, psutil.Error):
+            return []
+        return [pid]
 
     def __str__(self):
         return "NEO4j"
@@ -161,9 +571,14 @@ class ArangoDB(GraphDriver):
     """
     Driver for ArangoDB
     """
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, pool_size=10, timeout=30):
+        """
+        :param pool_size: The maximum number of HTTP connections kept open to the server
+        :param timeout: Seconds to wait for a response of the server
+        """
         super().__init__()
-        self.conn = Connection(username=user, password=password, arangoURL=uri)
+        self.conn = Connection(username=user, password=password, arangoURL=uri, pool_maxsize=pool_size,
+                               timeout=timeout)
         if "benchmark" in self.conn.databases:
             self.db = self.conn["benchmark"]
         else:
@@ -174,87 +589,180 @@ class ArangoDB(GraphDriver):
             self.db.createCollection(name="edges", className="Edges")
         if "benchgraph" not in self.db.graphs:
             self.query("GRAPH_CREATE('benchgraph', ['nodes', 'edges'])")
+        self.ensure_index()
 
-    def query(self, q):
+    def query(self, q, bind_vars: dict = None, **kwargs):
+        """
+        :param kwargs: Further arguments of AQLQuery, like rawResults or batchSize
+        """
+        res = None
+        if not self._suppressed:
+            self._query_count += 1
+            res = self.db.AQLQuery(q, bindVars=bind_vars or {}, **kwargs)
+        return res
+
+    def load_database(self, path_nodes: str, path_edges: str, batch_size: int = 5000, workers: int = 1):
+        """
+        :param workers: Number of edge imports sent at the same time, at most pool_size are useful
+        """
+        # The nodes go through the bulk import of add_nodes_batch. Their handles are then fetched with one query, so
+        # the edges can be bulk imported with _from and _to set instead of looking up both ends of every edge.
+        self._node_cache.clear()
+        for rows in _batched(({"id": nid, "test": "test"} for nid in _read_nodes(path_nodes)), batch_size):
+            self.add_nodes_batch(rows)
+        handles = self._handles()
+        edges = _read_edges(path_edges)
+        # Edges with an unknown end are skipped, like the lookup in add_edges_batch does
+        docs = ({"_from": handles[src], "_to": handles[dst], "test": "test"} for src, dst in edges
+                if src in handles and dst in handles)
+        _parallel(lambda batch: self._import("edges", batch), _batched(docs, batch_size), workers)
+
+    def _handles(self):
+        """
+        :return: A dict from the id of every node to its document handle
+        """
+        res = self.query("FOR n IN nodes RETURN [n.id, n._id]", rawResults=True, batchSize=10000)
+        return dict(res) if res is not None else {}
+
+    def import_database(self, path_nodes: str, path_edges: str):
+        # ArangoDB cannot read files from its own disk, the files are read here and streamed to the HTTP bulk import.
+        # The node ids become the document keys, so the edges can name their ends without looking them up.
+        self._node_cache.clear()
+        for docs in _batched(({"_key": nid, "id": nid, "test": "test"} for nid in _read_nodes(path_nodes)), 10000):
+            self._import("nodes", docs, onDuplicate="update")
+        edges = _read_edges(path_edges)
+        for docs in _batched(({"_from": src, "_to": dst, "test": "test"} for src, dst in edges), 10000):
+            self._import("edges", docs, fromPrefix="nodes", toPrefix="nodes")
+
+    def _import(self, collection: str, docs: list[dict], **params):
+        """
+        Insert the documents with one request to /_api/import, sent as JSON lines. With complete set the server
+        rejects the whole request if a single document fails, so nothing is written then.
+        :param collection: The collection to insert into
+        :param params: Further query parameters of the import
+        :return: The import statistics of the server
+        :raises CreationError: If the import failed
+        """
         res = None
         if not self._suppressed:
-            res = self.db.AQLQuery(q)
+            self._query_count += 1
+            r = self.conn.session.post(f"{self.db.getURL()}/import",
+                                       params={"collection": collection, "type": "documents", "complete": "true",
+                                               **params},
+                                       data="\n".join(json.dumps(doc) for doc in docs))
+            try:
+                res = r.json()
+            except ValueError:
+                res = {"error": True, "errorMessage": r.text}
+            if r.status_code != 201 or res.get("error") or res.get("errors"):
+                raise CreationError(f"Import into {collection} failed with status {r.status_code}: "
+                                    f"{res.get('errorMessage', res)}", res)
         return res
 
+    def ensure_index(self):
+        # Not sparse: a sparse index is only used when the filter value is known not to be null, which a lookup by a
+        # bind variable or another document's attribute (FILTER a.id == r.src) cannot prove.
+        self.db["nodes"].ensureHashIndex(fields=["id"], unique=False, sparse=False)
+        self.db["nodes"].ensureHashIndex(fields=["name"], unique=False, sparse=False)
+
     def clear(self):
+        self._node_cache.clear()
         self.query("FOR n IN nodes REMOVE n IN nodes")
         self.query("FOR n IN edges REMOVE n IN edges")
 
+    @_skip_if_suppressed
     def add_node(self, nid: int, labels: list[str], properties: dict):
-        # add node to arango
-        properties.update({"id": nid})
-        q = "INSERT {"
-        q += ", ".join([f"{k}: \"{v}\"" for k, v in properties.items()])
-        q += "}"
-        q += " INTO "
-        q += "nodes"
-        self.query(q)
+        self._node_cache.clear()
+        # add node to arango, without changing the caller's dict
+        self.query("INSERT @doc INTO nodes", {"doc": {**properties, "id": f"{nid}"}})
 
+    @_skip_if_suppressed
     def add_edge(self, src: str, dst: str, labels: list[str], properties: dict):
+        self._node_cache.clear()
         # add edge from src to dst to arango
-        q = f"FOR a IN nodes FILTER a.id == \"{src}\" FOR b IN nodes FILTER b.id == \"{dst}\" "
-        q += "INSERT { _from: a._id, _to: b._id, "
-        q += ", ".join([f"{k}: \"{v}\"" for k, v in properties.items()])
-        q += "}"
-        q += " INTO "
-        q += "edges"
-        self.query(q)
-
+        q = "FOR a IN nodes FILTER a.id == @src FOR b IN nodes FILTER b.id == @dst " \
+            "INSERT MERGE(@props, {_from: a._id, _to: b._id}) INTO edges"
+        self.query(q, {"src": f"{src}", "dst": f"{dst}", "props": properties})
+
+    @_skip_if_suppressed
+    def add_nodes_batch(self, rows: list[dict]):
+        self._node_cache.clear()
+        # The bulk import writes the documents without parsing and planning an AQL query
+        self._import("nodes", rows)
+
+    @_skip_if_suppressed
+    def add_edges_batch(self, rows: list[dict]):
+        self._node_cache.clear()
+        q = "FOR r IN @rows FOR a IN nodes FILTER a.id == r.src FOR b IN nodes FILTER b.id == r.dst " \
+            "INSERT MERGE(UNSET(r, \"src\", \"dst\"), {_from: a._id, _to: b._id}) INTO edges"
+        self.query(q, {"rows": rows})
+
+    @_skip_if_suppressed
     def get_single_node(self, labels: list[str], properties: dict):
-        q = "FOR n IN nodes FILTER "
-        q += " AND ".join([f"n.{k} == \"{v}\"" for k, v in properties.items()])
-        q += " RETURN n"
-        return self.query(q)
+        return self.query(self._get_node_query(tuple(properties)), properties)
 
-    def load_database(self, path_nodes: str, path_edges: str):
-        with open(path_nodes, "r") as f:
-            for line in f:
-                nid = int(line.strip())
-                self.add_node(nid, ["test"], {"test": "test"})
-        with open(path_edges, "r") as f:
-            for line in f:
-                src, dst = line.strip().split("\t")
-                self.add_edge(src, dst, ["test"], {"test": "test"})
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _get_node_query(keys: tuple):
+        # Only the keys shape the query text, it is built once per set of keys
+        return "FOR n IN nodes FILTER " + " AND ".join(f"n.{k} == @{k}" for k in keys) + " RETURN n"
 
+    @_skip_if_suppressed
     def get_nodes_hops(self, node_id, hops):
-        q = f"LET vertex = (FOR v IN nodes FILTER v.id == \"{node_id}\" RETURN v) FOR v, e, p IN 1..{hops} " \
-            f"OUTBOUND vertex[0] GRAPH 'benchgraph' OPTIONS {{order:\"bfs\", uniqueVertices:\"global\"}} RETURN DISTINCT v"
-        return self.query(q)
+        q = "LET vertex = (FOR v IN nodes FILTER v.id == @id RETURN v) FOR v, e, p IN 1..@hops " \
+            "OUTBOUND vertex[0] GRAPH 'benchgraph' OPTIONS {order:\"bfs\", uniqueVertices:\"global\"} RETURN DISTINCT v"
+        return self.query(q, {"id": f"{node_id}", "hops": hops})
 
+    @_skip_if_suppressed
     def ssp(self, src, dst):
-        q = f"LET start = (FOR v IN nodes FILTER v.id == \"{src}\" RETURN v) " \
-            f"LET end = (FOR v IN nodes FILTER v.id == \"{dst}\" RETURN v) " \
-            f"FOR p IN OUTBOUND SHORTEST_PATH start[0] TO end[0] GRAPH benchgraph RETURN p"
-        return self.query(q)
+        q = "LET start = (FOR v IN nodes FILTER v.id == @src RETURN v) " \
+            "LET end = (FOR v IN nodes FILTER v.id == @dst RETURN v) " \
+            "FOR p IN OUTBOUND SHORTEST_PATH start[0] TO end[0] GRAPH benchgraph RETURN p"
+        return self.query(q, {"src": f"{src}", "dst": f"{dst}"})
 
-    def get_pids(self):
-        return [p.pid for p in psutil.process_iter() if p.name() == "arangod.exe"]
+    def _find_pids(self):
+        # process_iter fetches the names in its single pass instead of one name() call per process. The executable
+        # is arangod.exe on Windows and arangod on Linux.
+        return [p.pid for p in psutil.process_iter(["name"]) if p.info["name"] in ("arangod", "arangod.exe")]
 
     def __str__(self):
         return "ArangoDB"
 
 
+# pyorient clients with the benchmark database open, by (uri, user). A driver created again for the same server reuses
+# the client instead of connecting, listing the databases and opening one again.
+_orient_clients = {}
+
+
 class OrientDB(GraphDriver):
     """
     Driver for OrientDB
     """
     def __init__(self, uri, user, password):
         super().__init__()
-        self.client = pyorient.OrientDB(uri, 2424)
-        self.client.set_session_token(True)
-        self.session_id = self.client.connect(user, password)
-        if "benchmark" not in self.client.db_list().oRecordData["databases"].keys():
-            self.client.db_create("benchmark", pyorient.DB_TYPE_GRAPH, pyorient.STORAGE_TYPE_PLOCAL)
-        self.client.db_open("benchmark", user, password)
+        # Statements held back inside bulk_tx, None outside of it
+        self._buffer = None
+        # Node id -> batch variable of the vertex created in the held back statements
+        self._vars = {}
+        # Number of batch variables in the held back statements. Not len(self._vars), which stays the same when an
+        # id is created twice and would hand out a name that is already taken.
+        self._var_count = 0
+        if (uri, user) in _orient_clients:
+            self.client = _orient_clients[uri, user]
+        else:
+            self.client = pyorient.OrientDB(uri, 2424)
+            self.client.set_session_token(True)
+            self.client.connect(user, password)
+            if "benchmark" not in self.client.db_list().oRecordData["databases"].keys():
+                self.client.db_create("benchmark", pyorient.DB_TYPE_GRAPH, pyorient.STORAGE_TYPE_PLOCAL)
+            self.client.db_open("benchmark", user, password)
+            self.ensure_index()
+            _orient_clients[uri, user] = self.client
 
     def query(self, q):
         res = None
         if not self._suppressed:
+            self._query_count += 1
             try:
                 res = self.client.command(q)
             except pyorient.exceptions.PyOrientCommandException:
@@ -263,48 +771,158 @@ class OrientDB(GraphDriver):
                 print("Timeout")
         return res
 
+    def batch(self, statements: list[str]):
+        """
+        Execute the statements as one batch script in a single transaction and round-trip. Unlike query, a failing
+        statement is not ignored: it rolls back the whole script, so none of the statements were written.
+        :raises PyOrientCommandException: If a statement failed
+        """
+        res = None
+        if not self._suppressed:
+            self._query_count += 1
+            try:
+                res = self.client.batch("begin;\n" + ";\n".join(statements) + ";\ncommit;")
+            except TimeoutError:
+                print("Timeout")
+        return res
+
+    def load_database(self, path_nodes: str, path_edges: str, batch_size: int = BATCH_SIZE):
+        # The vertices are created in batch scripts, then the record id of every vertex is fetched with one query.
+        # The edges name their ends by record id, which needs no lookup at all.
+        self._node_cache.clear()
+        for rows in _batched(({"id": nid, "test": "test"} for nid in _read_nodes(path_nodes)), batch_size):
+            self.add_nodes_batch(rows)
+        rids = self._rids()
+        content = json.dumps({"test": "test"})
+        edges = _read_edges(path_edges)
+        # Edges with an unknown end are skipped, like the subqueries in add_edges_batch do
+        statements = (f"CREATE EDGE E FROM {rids[src]} TO {rids[dst]} CONTENT {content}" for src, dst in edges
+                      if src in rids and dst in rids)
+        for batch in _batched(statements, batch_size):
+            self.batch(batch)
+
+    def _rids(self):
+        """
+        :return: A dict from the id of every vertex to its record id
+        """
+        res = self.query("SELECT FROM V")
+        return {f"{r.oRecordData.get('id')}": r._rid for r in res} if res else {}
+
+    def _write(self, statements: list[str]):
+        """
+        Execute the statements, or hold them back inside bulk_tx until BATCH_SIZE of them can be sent as one batch
+        """
+        if self._buffer is None:
+            if len(statements) == 1:
+                return self.query(statements[0])
+            return self.batch(statements)
+        self._buffer.extend(statements)
+        if len(self._buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def _create_vertex(self, nid, content: str):
+        # Inside bulk_tx the vertex is kept in a batch variable, edges sent in the same batch use it directly
+        if self._buffer is None:
+            return f"CREATE VERTEX V CONTENT {content}"
+        var = f"v{self._var_count}"
+        self._var_count += 1
+        self._vars[f"{nid}"] = var
+        return f"LET {var} = CREATE VERTEX V CONTENT {content}"
+
+    def _vertex(self, nid):
+        # The batch variable if the vertex is created in the held back statements, else look it up by its id
+        if f"{nid}" in self._vars:
+            return f"${self._vars[f'{nid}']}"
+        return self._lookup(nid)
+
+    @staticmethod
+    def _lookup(nid):
+        # pyorient cannot bind parameters to a command, the id is quoted and escaped as a JSON string instead
+        return f"(SELECT FROM V WHERE id = {json.dumps(f'{nid}')})"
+
+    def flush(self):
+        # The held back statements are taken out first, so a failing batch does not leave them to be sent again
+        statements = self._buffer
+        if self._buffer:
+            self._buffer = []
+        self._vars.clear()
+        self._var_count = 0
+        if statements:
+            self.batch(statements)
+
+    @contextmanager
+    def bulk_tx(self):
+        """
+        Hold back all writes inside the with-block and send them as batch scripts of BATCH_SIZE statements, each
+        in one transaction and round-trip. Statements still held back when an exception leaves the block are dropped.
+        """
+        self._buffer = []
+        try:
+            yield
+            self.flush()
+        finally:
+            self._buffer = None
+            self._vars.clear()
+            self._var_count = 0
+
+    def ensure_index(self):
+        # Fails (and is ignored by query) when the index already exists.
+        self.query("CREATE INDEX V.id ON V (id) NOTUNIQUE STRING")
+        self.query("CREATE INDEX V.name ON V (name) NOTUNIQUE STRING")
+
     def clear(self):
+        self._node_cache.clear()
         self.query("DELETE VERTEX V")
         self.query("DELETE EDGE E")
 
+    @_skip_if_suppressed
     def add_node(self, nid: int, labels: list[str], properties: dict):
-        # add node to orient
-        properties.update({"id": nid})
-        q = f"CREATE VERTEX V content {properties}"
-        self.query(q)
+        self._node_cache.clear()
+        # add node to orient, without changing the caller's dict. The id is a string like on the other drivers.
+        self._write([self._create_vertex(nid, json.dumps({**properties, "id": f"{nid}"}))])
 
+    @_skip_if_suppressed
     def add_edge(self, src: str, dst: str, labels: list[str], properties: dict):
+        self._node_cache.clear()
         # add edge from src to dst to orient
-        q = f"CREATE EDGE E FROM (SELECT FROM V WHERE id = \"{src}\") TO (SELECT FROM V WHERE id = \"{dst}\")"
-        q += f" content {properties}"
-        self.query(q)
-
+        q = f"CREATE EDGE E FROM {self._vertex(src)} TO {self._vertex(dst)} CONTENT {json.dumps(properties)}"
+        self._write([q])
+
+    @_skip_if_suppressed
+    def add_nodes_batch(self, rows: list[dict]):
+        self._node_cache.clear()
+        self._write([self._create_vertex(r["id"], json.dumps(r)) for r in rows])
+
+    @_skip_if_suppressed
+    def add_edges_batch(self, rows: list[dict]):
+        self._node_cache.clear()
+        statements = []
+        for r in rows:
+            properties = {k: v for k, v in r.items() if k not in ("src", "dst")}
+            statements.append(f"CREATE EDGE E FROM {self._vertex(r['src'])} TO {self._vertex(r['dst'])} "
+                              f"CONTENT {json.dumps(properties)}")
+        self._write(statements)
+
+    @_skip_if_suppressed
     def get_single_node(self, labels: list[str], properties: dict):
         q = "SELECT FROM V WHERE "
-        q += " AND ".join([f"{k} = \"{v}\"" for k, v in properties.items()])
+        q += " AND ".join([f"{k} = {json.dumps(v)}" for k, v in properties.items()])
         return self.query(q)
 
+    @_skip_if_suppressed
     def get_nodes_hops(self, node_id, hops):
-        q = f"TRAVERSE OUT() FROM (SELECT FROM V WHERE id = \"{node_id}\") MAXDEPTH {hops}"
+        q = f"TRAVERSE OUT() FROM {self._lookup(node_id)} MAXDEPTH {int(hops)}"
         return self.query(q)
 
+    @_skip_if_suppressed
     def ssp(self, src, dst):
-        q = f"SELECT shortestPath((SELECT FROM V WHERE id = \"{src}\"), (SELECT FROM V WHERE id = \"{dst}\"))"
+        q = f"SELECT shortestPath({self._lookup(src)}, {self._lookup(dst)})"
         return self.query(q)
 
-    def load_database(self, path_nodes: str, path_edges: str):
-        with open(path_nodes, "r") as f:
-            for line in f:
-                nid = int(line.strip())
-                self.add_node(nid, ["test"], {"test": "test"})
-        with open(path_edges, "r") as f:
-            for line in f:
-                src, dst = line.strip().split("\t")
-                self.add_edge(src, dst, ["test"], {"test": "test"})
-
-    def get_pids(self):
-        return [p.pid for p in psutil.process_iter() if p.name() == "java.exe" and
-                [item for item in p.cmdline() if "orientdb" in item]]
+    def _find_pids(self):
+        # Only the java processes pay for reading their command line
+        return [p.pid for p in psutil.process_iter(["name"]) if p.info["name"] in ("java", "java.exe") and
+                any("orientdb" in item for item in p.cmdline())]
 
     def __str__(self):
         return "OrientDB"
@@ -1,114 +1,163 @@
+import argparse
 import matplotlib.pyplot as plt
-from tkinter import Tk, IntVar, Checkbutton, Button, W, filedialog
+import numpy as np
+from tkinter import Tk, Toplevel, IntVar, Checkbutton, Button, W, filedialog
 
+_root = None
 
-def show_single_bench(path: str, to_show: list):
+
+def load_bench(path: str):
     """
-    Creates a plot of a single benchmark with the columns given in to_show.
+    Reads a benchmark file as written by benchmark.save_data.
     :param path: path to the csv file
-    :param to_show: list of columns to show
+    :return: the header and an array with one column per header entry
     """
     with open(path, "r") as f:
         head = f.readline().strip().split(",")
-        data = [[] for _ in head]
-        for line in f:
-            for i, v in enumerate(line.strip().split(",")):
-                data[i].append(float(v))
-    x_axis_name = [h for h in head if h[0] == "_"][0]
-    x_axis = data[head.index(x_axis_name)]
-    head.remove(x_axis_name)
-    data.remove(x_axis)
-    data = [d for d, h in zip(data, head) if h in to_show]
-    for d, h in zip(data, to_show):
-        plt.plot(x_axis, d, label=h)
+        # older files end every row with a comma, usecols drops the empty column after it
+        data = np.loadtxt(f, delimiter=",", usecols=range(len(head)), ndmin=2)
+    return head, data
+
+
+def x_axis_index(head: list):
+    """
+    :param head: header of a benchmark file
+    :return: index of the x axis column, the one whose name starts with "_"
+    """
+    return next(i for i, h in enumerate(head) if h.startswith("_"))
+
+
+def columns_by_name(head: list, data: np.ndarray):
+    """
+    :param head: header of a benchmark file
+    :param data: data of the benchmark file, as returned by load_bench
+    :return: dict from each header entry to its column
+    """
+    return {h: data[:, i] for i, h in enumerate(head)}
+
+
+def show_single_bench(head: list, data: np.ndarray, to_show: list):
+    """
+    Creates a plot of a single benchmark with the columns given in to_show.
+    :param head: header of the benchmark file
+    :param data: data of the benchmark file, as returned by load_bench
+    :param to_show: list of columns to show
+    """
+    x_axis_name = head[x_axis_index(head)]
+    columns = columns_by_name(head, data)
+    x_axis = columns.pop(x_axis_name)
+    if to_show:
+        # one call draws a line for every column of the stacked array
+        lines = plt.plot(x_axis, np.column_stack([columns[h] for h in to_show]))
+        plt.legend(lines, to_show)
     plt.xlabel(x_axis_name[1:])
-    plt.legend()
     plt.show()
 
 
-def show_multiple_bench(paths: tuple[str], to_show: list, use_avg: bool):
+def show_multiple_bench(loaded: dict, to_show: list, use_avg: bool):
     """
     Creates a plot of multiple benchmarks with the columns given in to_show.
     Useful for comparing different databases.
-    :param paths: paths to the csv files
+    :param loaded: header and data of each benchmark file as returned by load_bench, by path
     :param to_show: list of columns to show
     :param use_avg: if True, the average of the columns is shown
     """
     db_names = []
-    paths_ = []
+    benches = []
+    x_axis_name = None
     for db in ["Orient", "Arango", "NEO4j"]:
-        for path in paths:
+        for path in loaded:
             if db in path:
+                head, data = loaded[path]
+                # the x axis is found once per file, not again for every column
+                x_axis_name = head[x_axis_index(head)]
                 db_names.append(db)
-                paths_.append(path)
+                benches.append(columns_by_name(head, data))
                 break
-    paths = paths_
     for val in to_show:
-        for i, path in enumerate(paths):
-            with open(path, "r") as f:
-                head = f.readline().strip().split(",")
-                index_d = head.index(val)
-                index_x = head.index([h for h in head if h[0] == "_"][0])
-                data = []
-                x_axis = []
-                for line in f:
-                    data.append(float(line.strip().split(",")[index_d]))
-                    x_axis.append(float(line.strip().split(",")[index_x]))
+        for db_name, columns in zip(db_names, benches):
             if use_avg:
-                plt.bar(db_names[i], sum(data) / len(data))
+                plt.bar(db_name, columns[val].mean())
             else:
-                plt.plot(x_axis, data, label=db_names[i])
+                plt.plot(columns[x_axis_name], columns[val], label=db_name)
         if not use_avg:
-            plt.xlabel([h for h in head if h[0] == "_"][0][1:])
+            plt.xlabel(x_axis_name[1:])
             plt.legend()
         plt.ylabel(val)
         plt.show()
 
 
+def get_root():
+    """
+    Returns the hidden Tk root that all dialogs share, so Tcl is only initialized once.
+    """
+    global _root
+    if _root is None:
+        _root = Tk()
+        _root.withdraw()
+    return _root
+
+
 def select_window(values: list):
     """
     Creates a window with checkboxes for selecting the columns to show.
     :param values: list of columns
     """
-    root = Tk()
-    root.title("Select values")
-    root.geometry("200x200")
-    root.attributes("-topmost", True)
+    window = Toplevel(get_root())
+    window.title("Select values")
+    window.geometry("200x200")
+    window.attributes("-topmost", True)
     selected = []
-    use_avg = IntVar()
+    use_avg = IntVar(window)
     for i, v in enumerate(values):
-        var = IntVar()
-        Checkbutton(root, text=v, variable=var).grid(row=i, sticky=W)
+        var = IntVar(window)
+        Checkbutton(window, text=v, variable=var).grid(row=i, sticky=W)
         selected.append(var)
-    Checkbutton(root, text="Use average", variable=use_avg).grid(row=len(values), sticky=W)
-    Button(root, text="OK", command=root.destroy).grid(row=len(values) + 1, sticky=W)
-    root.update()
-    root.mainloop()
+    Checkbutton(window, text="Use average", variable=use_avg).grid(row=len(values), sticky=W)
+    Button(window, text="OK", command=window.destroy).grid(row=len(values) + 1, sticky=W)
+    window.wait_window()
     return [value for value, var in zip(values, selected) if var.get() == 1], use_avg.get() == 1
 
 
+def select_stdin(values: list):
+    """
+    Asks for the columns to show on the console instead of in a window.
+    :param values: list of columns
+    """
+    for i, v in enumerate(values):
+        print(f"{i}: {v}")
+    answer = input("Columns to show (indices separated by spaces, add 'avg' to use the average): ").split()
+    return [values[int(a)] for a in answer if a != "avg"], "avg" in answer
+
+
 if __name__ == "__main__":
-    paths = filedialog.askopenfilenames()
+    parser = argparse.ArgumentParser(description="Plot benchmark results")
+    parser.add_argument("paths", nargs="*", help="Benchmark files to plot, a file dialog opens if none are given")
+    parser.add_argument("--select", action="store_true", help="Select the columns on the console instead of in a window")
+    args = parser.parse_args()
+
+    paths = args.paths or filedialog.askopenfilenames(parent=get_root())
     print(paths)
+    # every file is read once, the plots use the loaded data
+    loaded = {path: load_bench(path) for path in paths}
     to_plot = []
     x_name = None
-    for path in paths:
-        with open(path, "r") as f:
-            for val in f.readline().strip().split(","):
-                if val[0] == "_":
-                    if not x_name:
-                        x_name = val
-                    elif val != x_name:
-                        raise ValueError("X axis is not the same")
-                else:
-                    if val not in to_plot:
-                        to_plot.append(val)
+    for head, _ in loaded.values():
+        for val in head:
+            if val[0] == "_":
+                if not x_name:
+                    x_name = val
+                elif val != x_name:
+                    raise ValueError("X axis is not the same")
+            else:
+                if val not in to_plot:
+                    to_plot.append(val)
     print(to_plot)
-    to_plot, use_avg = select_window(to_plot)
+    to_plot, use_avg = select_stdin(to_plot) if args.select else select_window(to_plot)
     print(to_plot)
     if len(paths) == 1:
-        show_single_bench(paths[0], to_plot)
+        show_single_bench(*loaded[paths[0]], to_plot)
     elif len(paths) > 1:
-        show_multiple_bench(paths, to_plot, use_avg)
+        show_multiple_bench(loaded, to_plot, use_avg)
     else:
         pass